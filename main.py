@@ -8,59 +8,1133 @@ Model Context Protocolを使用して、Excelファイルの操作を提供し
 
 import os
 import sys
+import copy
 import json
+import math
+import queue
+import atexit
+import contextlib
+import shutil
+import datetime
+import functools
+import posixpath
+import re
+import tempfile
+import threading
+import warnings
+from collections import OrderedDict
+from zipfile import ZipFile, ZIP_DEFLATED
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from fastmcp import FastMCP
+from fastmcp.tools import ToolResult
+from pydantic_core import to_jsonable_python
+import numpy as np
 import pandas as pd
 import openpyxl
+import xlsxwriter
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.utils.exceptions import CellCoordinatesException
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, range_boundaries, get_column_letter
+from openpyxl.writer.excel import ExcelWriter
+from openpyxl.xml import LXML
+from openpyxl.workbook.child import INVALID_TITLE_REGEX
+from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.xml.constants import SHEET_MAIN_NS, REL_NS, PKG_REL_NS, CONTYPES_NS
+
+# python-calamine（Rust実装のパーサー）が利用可能であれば読み取りに使用する
+try:
+    import python_calamine  # noqa: F401
+    _READ_ENGINE = "calamine"
+except ImportError:
+    _READ_ENGINE = None
+
+# pyarrow が利用可能であれば文字列検索にArrowの計算カーネルを使用する
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+# orjson が利用可能であればツールの戻り値のJSON変換に使用する
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# lxml がない場合、openpyxl は保存時に標準ライブラリのXMLシリアライザを使うため遅くなる
+# また、ワークシートXMLを直接書き換える高速な更新（_patch_cells_inplace）も使用できない
+if LXML:
+    from lxml import etree
+else:
+    warnings.warn("lxml がインストールされていません。Excelファイルの保存が遅くなる可能性があります。")
+
+# write_excel_file で使用する xlsxwriter のオプション
+# 文字列のURL自動変換は行わず、openpyxl と同じく値をそのまま書き込む
+_XLSXWRITER_OPTIONS = {
+    "constant_memory": True,
+    "strings_to_urls": False,
+    "remove_timezone": True,
+    "default_date_format": "yyyy-mm-dd hh:mm:ss",
+}
+
+# openpyxl で保存する際のZIP圧縮レベル（0〜9）
+# zlib の既定値(6)より低くすると、ファイルサイズは多少増えるが保存が速くなる
+_COMPRESSION_LEVEL = int(os.environ.get("EXCEL_MCP_COMPRESSION_LEVEL", "1"))
+
+# ワークシートXML内の数式要素 <f>（名前空間の接頭辞付きも含む）
+_FORMULA_TAG = re.compile(rb"<(?:[A-Za-z_][\w.-]*:)?f[\s/>]")
+
+# 新規作成するファイルのパーミッションの計算に使用する umask
+# （一時ファイルは所有者のみ読み書き可能な状態で作成されるため、置き換え前に通常のパーミッションへ戻す）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# 解析済みのワークブック・DataFrameのキャッシュ
+# キーは (絶対パス, 更新時刻, サイズ, 種別...) で、ファイルが変更されると自動的に一致しなくなる
+_CACHE_MAXSIZE = 16
+_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# 編集セッション中のワークブック（絶対パス → ワークブック）
+# セッション中の変更はメモリ上にのみ反映され、commit_workbook_session で保存される
+_sessions: Dict[str, openpyxl.Workbook] = {}
+_sessions_lock = threading.Lock()
+
+# 編集ツールの保存をバックグラウンドで行うかどうか
+# 有効な場合、編集ツールは保存を予約してすぐに応答し、専用のスレッドが順にファイルへ書き出す
+_BACKGROUND_SAVE = os.environ.get("EXCEL_MCP_BACKGROUND_SAVE", "1") != "0"
+
+# バックグラウンド保存の待ち行列と、保存待ちの件数（絶対パス → 件数）・保存時のエラー（絶対パス → メッセージ）
+# 保存待ちのファイルを扱うツールは、_stat_or_error で保存の完了を待ってから処理を行う
+_save_queue: "queue.Queue[tuple]" = queue.Queue()
+_save_thread: Optional[threading.Thread] = None
+_pending_saves: Dict[str, int] = {}
+_save_errors: Dict[str, str] = {}
+_save_condition = threading.Condition()
 
 # MCPアプリケーションの作成
 app = FastMCP("Excel File Editor 📊")
 
+def _json_default(value: Any) -> Any:
+    """
+    orjson が変換できない値を変換する
+    
+    pandas の Timestamp や Timedelta などは orjson では直接変換されないため、
+    FastMCP（pydantic）と同じ形式で変換する。欠損値（NaT）は NaN と同じく null にする
+    """
+    if value is pd.NaT:
+        return None
+    return to_jsonable_python(value, fallback=str)
+
+def _json_tool(func):
+    """
+    ツールの戻り値（辞書）を orjson で一度だけJSONに変換して返すデコレーター
+    
+    FastMCP は戻り値をテキスト用と構造化データ用にそれぞれ pydantic で変換し、
+    NumPyの数値型などは文字列として扱われる。orjson はNumPyの数値型や日時をC実装で直接変換できるため、
+    変換結果をテキストと構造化データの両方に使用する（orjson がない場合は何もしない）
+    """
+    if orjson is None:
+        return func
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        text = orjson.dumps(
+            func(*args, **kwargs),
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            default=_json_default
+        )
+        return ToolResult(content=text.decode(), structured_content=orjson.loads(text))
+    return wrapper
+
+def _stat_or_error(file_path: str, missing_ok: bool = False) -> tuple:
+    """
+    ファイルの状態を取得する（存在確認とキャッシュキー作成を1回のstatで行う）
+    
+    バックグラウンドでの保存が予約されている場合は、保存の完了を待ってから取得する。
+    以前の保存に失敗していた場合は、その変更が失われたことをエラーとして返す
+    
+    Args:
+        file_path: Excelファイルのパス
+        missing_ok: Trueの場合、ファイルが存在しなくてもエラーにせず (None, None) を返す
+        
+    Returns:
+        (os.stat_result, None) または ファイルが存在しない場合・保存に失敗していた場合は (None, エラーの辞書)
+    """
+    save_error = _wait_for_pending_saves(file_path)
+    if save_error is not None:
+        return None, {"error": f"以前の保存に失敗したため、変更は保存されていません: {save_error}"}
+    try:
+        return os.stat(file_path), None
+    except (FileNotFoundError, NotADirectoryError):
+        if missing_ok:
+            return None, None
+        return None, {"error": f"ファイルが見つかりません: {file_path}"}
+
+def _cache_key(file_path: str, st: os.stat_result, *kind: Any) -> tuple:
+    """ファイルの状態に対応するキャッシュキーを作成する"""
+    return (os.path.abspath(file_path), st.st_mtime_ns, st.st_size) + kind
+
+def _cache_get(key: tuple, pop: bool = False) -> Any:
+    """キャッシュから値を取得する（pop=True の場合は取り出して削除する）"""
+    with _cache_lock:
+        if key not in _cache:
+            return None
+        if pop:
+            return _cache.pop(key)
+        _cache.move_to_end(key)
+        return _cache[key]
+
+def _cache_put(key: tuple, value: Any) -> None:
+    """キャッシュに値を格納し、上限を超えた古いエントリを削除する"""
+    with _cache_lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_MAXSIZE:
+            _cache.popitem(last=False)
+
+def _cache_invalidate(file_path: str) -> None:
+    """指定したファイルのキャッシュをすべて削除する"""
+    path = os.path.abspath(file_path)
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] == path]:
+            del _cache[key]
+
+def _checkout_workbook(file_path: str, st: os.stat_result) -> openpyxl.Workbook:
+    """
+    編集用のワークブックを取得する
+    
+    編集セッション中であればセッションのワークブックを返す。
+    それ以外はキャッシュにあればそれを取り出して使用し、なければファイルを読み込む。
+    取り出したワークブックは _save_workbook による保存後にキャッシュへ戻る
+    （保存前にエラーが発生した場合は戻さないため、途中まで変更された状態は残らない）
+    
+    Args:
+        file_path: Excelファイルのパス
+        st: _stat_or_error で取得したファイルの状態
+        
+    Returns:
+        openpyxlのワークブック
+    """
+    with _sessions_lock:
+        workbook = _sessions.get(os.path.abspath(file_path))
+    if workbook is not None:
+        return workbook
+    
+    workbook = _cache_get(_cache_key(file_path, st, "workbook"), pop=True)
+    if workbook is None:
+        workbook = openpyxl.load_workbook(file_path)
+    return workbook
+
+def _checkin_workbook(file_path: str, workbook: openpyxl.Workbook) -> None:
+    """保存済みのワークブックをキャッシュへ戻し、同じファイルの古いキャッシュを削除する"""
+    _cache_invalidate(file_path)
+    _cache_put(_cache_key(file_path, os.stat(file_path), "workbook"), workbook)
+
+def _write_zip(file_path: str, fill: Callable[[ZipFile], None]) -> None:
+    """
+    xlsxファイル（ZIP）を安全に書き出す
+    
+    同じディレクトリの一時ファイルに書き出してディスクへ同期（fsync）してから置き換えるため、
+    途中で失敗したりプロセスが終了したりしても元のファイルは壊れない
+    
+    Args:
+        file_path: 保存先のパス
+        fill: 書き込み用に開いたZipFileにメンバーを書き込む関数
+    """
+    fd, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(file_path)))
+    try:
+        with os.fdopen(fd, 'wb') as stream:
+            with ZipFile(stream, 'w', ZIP_DEFLATED, allowZip64=True, compresslevel=_COMPRESSION_LEVEL) as archive:
+                fill(archive)
+            stream.flush()
+            os.fsync(stream.fileno())
+        try:
+            shutil.copymode(file_path, temp_path)
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temp_path)
+        raise
+
+def _write_workbook(file_path: str, workbook: openpyxl.Workbook) -> None:
+    """
+    ワークブックをファイルに書き出す
+    
+    openpyxl の Workbook.save と同じ処理を、_COMPRESSION_LEVEL の圧縮レベルで行う
+    
+    Args:
+        file_path: 保存先のパス
+        workbook: 保存するワークブック
+    """
+    if workbook.write_only and not workbook.worksheets:
+        workbook.create_sheet()
+    workbook.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+    _write_zip(file_path, lambda archive: ExcelWriter(workbook, archive).save())
+
+def _store_workbook(file_path: str, workbook: openpyxl.Workbook) -> None:
+    """ワークブックを書き出し、キャッシュを更新する"""
+    _write_workbook(file_path, workbook)
+    if workbook.write_only:
+        _cache_invalidate(file_path)
+    else:
+        _checkin_workbook(file_path, workbook)
+
+def _save_worker() -> None:
+    """バックグラウンド保存の待ち行列からワークブックを取り出し、順に書き出す"""
+    while True:
+        path, workbook = _save_queue.get()
+        try:
+            _store_workbook(path, workbook)
+            with _save_condition:
+                _save_errors.pop(path, None)
+        except Exception as e:
+            with _save_condition:
+                _save_errors[path] = str(e)
+            warnings.warn(f"ファイルの保存に失敗しました: {path}: {e}")
+        finally:
+            with _save_condition:
+                _pending_saves[path] -= 1
+                if not _pending_saves[path]:
+                    del _pending_saves[path]
+                _save_condition.notify_all()
+            _save_queue.task_done()
+
+def _wait_for_pending_saves(file_path: str) -> Optional[str]:
+    """
+    指定したファイルのバックグラウンド保存がすべて完了するまで待つ
+    
+    Returns:
+        保存に失敗していた場合はそのエラーメッセージ（取り出したエラーは消去される）、それ以外は None
+    """
+    path = os.path.abspath(file_path)
+    with _save_condition:
+        while path in _pending_saves:
+            _save_condition.wait()
+        return _save_errors.pop(path, None)
+
+def _flush_saves() -> None:
+    """予約されているすべてのバックグラウンド保存の完了を待つ（終了時にも呼び出される）"""
+    _save_queue.join()
+
+atexit.register(_flush_saves)
+
+def _save_workbook(file_path: str, workbook: openpyxl.Workbook) -> None:
+    """
+    編集したワークブックを保存する
+    
+    編集セッション中のワークブックは保存せず、commit_workbook_session まで変更を保持する。
+    _BACKGROUND_SAVE が有効な場合は保存を予約してすぐに戻り、書き出しは専用のスレッドで行う
+    （ワークブックはキャッシュから取り出されているため、保存が終わるまで他のツールからは使用されない）
+    
+    Args:
+        file_path: Excelファイルのパス
+        workbook: 保存するワークブック
+    """
+    global _save_thread
+    path = os.path.abspath(file_path)
+    with _sessions_lock:
+        if _sessions.get(path) is workbook:
+            return
+    
+    if not _BACKGROUND_SAVE:
+        _store_workbook(path, workbook)
+        return
+    
+    with _save_condition:
+        if _save_thread is None:
+            _save_thread = threading.Thread(target=_save_worker, name="excel-mcp-save", daemon=True)
+            _save_thread.start()
+        _pending_saves[path] = _pending_saves.get(path, 0) + 1
+    _save_queue.put((path, workbook))
+
+def _resolve_part(base: str, target: str) -> str:
+    """リレーションのTargetを、ZIP内のパスに変換する"""
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base), target))
+
+def _workbook_parts(archive: ZipFile) -> tuple:
+    """ワークブックXMLと、そのリレーションXMLのZIP内パスを取得する"""
+    package_rels = etree.fromstring(archive.read("_rels/.rels"))
+    workbook_part = next(
+        _resolve_part("", rel.get("Target")) for rel in package_rels
+        if rel.get("Type") == f"{REL_NS}/officeDocument"
+    )
+    rels_part = posixpath.join(posixpath.dirname(workbook_part), "_rels", posixpath.basename(workbook_part) + ".rels")
+    return workbook_part, rels_part
+
+def _find_sheet_part(archive: ZipFile, sheet_name: str) -> Optional[str]:
+    """
+    シート名に対応するワークシートXMLのZIP内パスを取得する
+    
+    Args:
+        archive: xlsxファイルを開いたZipFile
+        sheet_name: シート名
+        
+    Returns:
+        ワークシートXMLのパス（シートが見つからない場合は None）
+    """
+    workbook_part, rels_part = _workbook_parts(archive)
+    
+    # シート名 → リレーションID → ワークシートXMLのパス
+    workbook_xml = etree.fromstring(archive.read(workbook_part))
+    rel_id = next(
+        (sheet.get(f"{{{REL_NS}}}id") for sheet in workbook_xml.iterfind(f"{{{SHEET_MAIN_NS}}}sheets/{{{SHEET_MAIN_NS}}}sheet")
+         if sheet.get("name") == sheet_name),
+        None
+    )
+    if rel_id is None:
+        return None
+    
+    workbook_rels = etree.fromstring(archive.read(rels_part))
+    for rel in workbook_rels.iterfind(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("Id") == rel_id and rel.get("Type") == f"{REL_NS}/worksheet":
+            return _resolve_part(workbook_part, rel.get("Target"))
+    return None
+
+def _can_patch_value(value: Any) -> bool:
+    """ワークシートXMLの書き換えだけで設定できる値かどうか（数式・日付・エラー値などはopenpyxlで処理する）"""
+    if value is None or isinstance(value, bool):
+        return True
+    if isinstance(value, (int, float)):
+        return math.isfinite(value)
+    if isinstance(value, str):
+        return not value.startswith("=") and value not in ERROR_CODES
+    return False
+
+def _set_cell_element_value(cell: Any, value: Any, namespace: str = SHEET_MAIN_NS) -> None:
+    """
+    <c> 要素の値を置き換える（スタイル属性 s はそのまま残す）
+    
+    namespace に空文字を指定すると、名前空間なしの要素を作成する（逐次書き出し用）
+    """
+    ns = f"{{{namespace}}}" if namespace else ""
+    for child in cell.findall(f"{ns}v") + cell.findall(f"{ns}is"):
+        cell.remove(child)
+    cell.attrib.pop("t", None)
+    if value is None:
+        return
+    
+    if isinstance(value, str):
+        cell.set("t", "inlineStr")
+        inline = etree.Element(f"{ns}is")
+        text = etree.SubElement(inline, f"{ns}t")
+        text.text = value
+        if value != value.strip():
+            text.set("{http://www.w3.org/XML/1998/namespace}space", "preserve")
+        cell.insert(0, inline)
+    else:
+        if isinstance(value, bool):
+            cell.set("t", "b")
+        v = etree.Element(f"{ns}v")
+        v.text = str(int(value)) if isinstance(value, bool) else repr(value)
+        cell.insert(0, v)
+
+def _patch_sheet_xml(sheet_xml: bytes, values: Dict[str, Any]) -> Optional[bytes]:
+    """
+    ワークシートXMLのセルの値を書き換える
+    
+    数式セルや結合セルへの書き込み、行番号が省略された行など、
+    XMLの書き換えだけでは安全に扱えない場合は None を返す
+    
+    Args:
+        sheet_xml: ワークシートXML
+        values: セル番地 → 設定する値
+        
+    Returns:
+        書き換えたワークシートXML、または None
+    """
+    root = etree.fromstring(sheet_xml)
+    sheet_data = root.find(f"{{{SHEET_MAIN_NS}}}sheetData")
+    if sheet_data is None:
+        return None
+    
+    # 結合セルの範囲内への書き込みはopenpyxlに任せる
+    merged = [range_boundaries(m.get("ref")) for m in root.iterfind(f"{{{SHEET_MAIN_NS}}}mergeCells/{{{SHEET_MAIN_NS}}}mergeCell")]
+    
+    rows = {}
+    for row in sheet_data.iterfind(f"{{{SHEET_MAIN_NS}}}row"):
+        if row.get("r") is None:
+            return None
+        rows[int(row.get("r"))] = row
+    
+    changed = []
+    for coordinate, value in values.items():
+        column_letter, row_number = coordinate_from_string(coordinate.upper())
+        column_number = column_index_from_string(column_letter)
+        address = f"{column_letter}{row_number}"
+        if any(min_col <= column_number <= max_col and min_row <= row_number <= max_row
+               for min_col, min_row, max_col, max_row in merged):
+            return None
+        
+        # 行を探す（なければ行番号順になる位置に追加する）
+        row = rows.get(row_number)
+        if row is None:
+            if value is None:
+                continue
+            row = etree.Element(f"{{{SHEET_MAIN_NS}}}row", r=str(row_number))
+            following = [r for number, r in rows.items() if number > row_number]
+            if following:
+                min(following, key=lambda r: int(r.get("r"))).addprevious(row)
+            else:
+                sheet_data.append(row)
+            rows[row_number] = row
+        
+        # セルを探す（なければ列順になる位置に追加する）
+        cell = None
+        for candidate in row.iterfind(f"{{{SHEET_MAIN_NS}}}c"):
+            if candidate.get("r") is None:
+                return None
+            candidate_column, _ = coordinate_from_string(candidate.get("r"))
+            candidate_number = column_index_from_string(candidate_column)
+            if candidate_number == column_number:
+                cell = candidate
+                break
+            if candidate_number > column_number:
+                if value is None:
+                    break
+                cell = etree.Element(f"{{{SHEET_MAIN_NS}}}c", r=address)
+                candidate.addprevious(cell)
+                break
+        if cell is None:
+            if value is None:
+                continue
+            cell = etree.SubElement(row, f"{{{SHEET_MAIN_NS}}}c", r=address)
+            row.attrib.pop("spans", None)
+        elif cell.find(f"{{{SHEET_MAIN_NS}}}f") is not None:
+            return None
+        
+        _set_cell_element_value(cell, value)
+        changed.append((column_number, row_number))
+    
+    # 使用範囲（dimension）を書き込んだセルを含むように広げる
+    dimension = root.find(f"{{{SHEET_MAIN_NS}}}dimension")
+    if dimension is not None and changed:
+        ref = dimension.get("ref", "A1")
+        min_col, min_row, max_col, max_row = range_boundaries(ref if ":" in ref else f"{ref}:{ref}")
+        columns = [c for c, _ in changed] + [min_col, max_col]
+        row_numbers = [r for _, r in changed] + [min_row, max_row]
+        dimension.set("ref", f"{get_column_letter(min(columns))}{min(row_numbers)}:{get_column_letter(max(columns))}{max(row_numbers)}")
+    
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+def _replace_zip_members(file_path: str, members: Dict[str, bytes]) -> None:
+    """
+    xlsxファイル（ZIP）の指定したメンバーだけを差し替える
+    
+    Args:
+        file_path: Excelファイルのパス
+        members: ZIP内のパス → 新しい内容
+    """
+    def fill(target: ZipFile) -> None:
+        with ZipFile(file_path) as source:
+            for info in source.infolist():
+                data = members[info.filename] if info.filename in members else source.read(info)
+                target.writestr(info.filename, data)
+    
+    _write_zip(file_path, fill)
+
+def _has_formulas(archive: ZipFile) -> bool:
+    """
+    ワークブックのいずれかのシートに数式があるかどうか
+    
+    数式には計算結果がキャッシュされているため、参照先のセルだけを書き換えると古い結果が残る
+    （openpyxl での保存はキャッシュを破棄し、読み込み時の再計算を指定する）
+    """
+    if "xl/calcChain.xml" in archive.namelist():
+        return True
+    workbook_part, rels_part = _workbook_parts(archive)
+    for rel in etree.fromstring(archive.read(rels_part)):
+        if rel.get("Type") == f"{REL_NS}/worksheet" and rel.get("TargetMode") != "External":
+            if _FORMULA_TAG.search(archive.read(_resolve_part(workbook_part, rel.get("Target")))):
+                return True
+    return False
+
+def _patch_cells_inplace(file_path: str, values_by_sheet: Dict[str, Dict[str, Any]]) -> bool:
+    """
+    ワークブック全体を読み込まずに、ワークシートXMLだけを書き換えてセルを更新する
+    
+    openpyxl での読み込み・保存はすべてのシートと共有文字列を処理するため、
+    大きなファイルの少数のセルの更新ではこちらの方が大幅に速い。
+    複数のシートの更新も、ZIPの書き換えは1回で行う。
+    数式のあるワークブックでは、数式の計算結果が古いまま残るためこの方法は使用しない
+    
+    Args:
+        file_path: Excelファイルのパス
+        values_by_sheet: シート名 → (セル番地 → 設定する値)
+        
+    Returns:
+        更新した場合は True、この方法で更新できない場合は False（呼び出し側でopenpyxlを使用する）
+    """
+    if not LXML or not file_path.endswith(('.xlsx', '.xlsm')):
+        return False
+    if not all(_can_patch_value(value) for values in values_by_sheet.values() for value in values.values()):
+        return False
+    with _sessions_lock:
+        if os.path.abspath(file_path) in _sessions:
+            return False
+    
+    members = {}
+    with ZipFile(file_path) as archive:
+        # 数式のあるワークブックは、キャッシュされた計算結果を破棄できるopenpyxlで更新する
+        if _has_formulas(archive):
+            return False
+        for sheet_name, values in values_by_sheet.items():
+            sheet_part = _find_sheet_part(archive, sheet_name)
+            if sheet_part is None:
+                return False
+            sheet_xml = _patch_sheet_xml(archive.read(sheet_part), values)
+            if sheet_xml is None:
+                return False
+            members[sheet_part] = sheet_xml
+    
+    _replace_zip_members(file_path, members)
+    _cache_invalidate(file_path)
+    return True
+
+def _patch_styles_xml(styles_xml: bytes, style_ids: List[int], font: Optional[Font], fill: Optional[PatternFill]) -> Optional[tuple]:
+    """
+    スタイルXMLにフォント・塗りつぶしを追加し、既存のセルスタイルをもとにした新しいセルスタイルを作成する
+    
+    フォント・塗りつぶし以外（表示形式・罫線・配置など）は元のセルスタイルのまま残す
+    
+    Args:
+        styles_xml: スタイルXML（xl/styles.xml）
+        style_ids: 変更対象のセルが使用しているセルスタイルの番号
+        font: 設定するフォント（None の場合は変更しない）
+        fill: 設定する塗りつぶし（None の場合は変更しない）
+        
+    Returns:
+        (書き換えたスタイルXML, 元のセルスタイルの番号 → 新しいセルスタイルの番号)、または None
+    """
+    root = etree.fromstring(styles_xml)
+    cell_xfs = root.find(f"{{{SHEET_MAIN_NS}}}cellXfs")
+    if cell_xfs is None:
+        return None
+    xfs = cell_xfs.findall(f"{{{SHEET_MAIN_NS}}}xf")
+    if any(style_id >= len(xfs) for style_id in style_ids):
+        return None
+    
+    def element_key(element: Any) -> tuple:
+        return (element.tag, sorted(element.attrib.items()), (element.text or "").strip(),
+                [element_key(child) for child in element])
+    
+    def append(container: Any, element: Any) -> int:
+        # 同じ内容の要素が既にあればそれを使用する（同じ書式を繰り返し設定してもスタイルXMLが肥大化しない）
+        key = element_key(element)
+        for index, existing in enumerate(container):
+            if element_key(existing) == key:
+                return index
+        container.append(element)
+        container.set("count", str(len(container)))
+        return len(container) - 1
+    
+    def append_style(container_tag: str, element: Any) -> Optional[int]:
+        container = root.find(f"{{{SHEET_MAIN_NS}}}{container_tag}")
+        if container is None:
+            return None
+        # openpyxl の to_tree() は名前空間なしの要素を返すため、スタイルXMLの名前空間に揃える
+        for child in element.iter():
+            child.tag = f"{{{SHEET_MAIN_NS}}}{child.tag}"
+        return append(container, element)
+    
+    attributes = {}
+    if font is not None:
+        attributes["fontId"], attributes["applyFont"] = append_style("fonts", font.to_tree()), "1"
+    if fill is not None:
+        attributes["fillId"], attributes["applyFill"] = append_style("fills", fill.to_tree()), "1"
+    if None in attributes.values():
+        return None
+    
+    # 使用されているセルスタイルごとに、フォント・塗りつぶしを差し替えたセルスタイルを追加する
+    mapping = {}
+    for style_id in style_ids:
+        xf = copy.deepcopy(xfs[style_id])
+        for name, value in attributes.items():
+            xf.set(name, str(value))
+        mapping[style_id] = append(cell_xfs, xf)
+    
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True), mapping
+
+def _patch_range_style(file_path: str, sheet_name: str, cell_range: str,
+                       font: Optional[Font], fill: Optional[PatternFill]) -> bool:
+    """
+    ワークブック全体を読み込まずに、ワークシートXMLとスタイルXMLだけを書き換えてセル範囲の書式を設定する
+    
+    範囲内のセル（存在しないセルは作成する）の s 属性を、フォント・塗りつぶしを差し替えた
+    新しいセルスタイルに付け替える。openpyxl でセルに font / fill を設定した場合と同じ結果になる
+    
+    Args:
+        file_path: Excelファイルのパス
+        sheet_name: シート名
+        cell_range: セル範囲（例: "A1:C3"）
+        font: 設定するフォント（None の場合は変更しない）
+        fill: 設定する塗りつぶし（None の場合は変更しない）
+        
+    Returns:
+        設定した場合は True、この方法で設定できない場合は False（呼び出し側でopenpyxlを使用する）
+    """
+    if not LXML or not file_path.endswith(('.xlsx', '.xlsm')):
+        return False
+    try:
+        min_col, min_row, max_col, max_row = range_boundaries(cell_range.upper())
+    except (ValueError, TypeError):
+        return False
+    if None in (min_col, min_row, max_col, max_row):
+        return False
+    with _sessions_lock:
+        if os.path.abspath(file_path) in _sessions:
+            return False
+    
+    with ZipFile(file_path) as archive:
+        sheet_part = _find_sheet_part(archive, sheet_name)
+        if sheet_part is None:
+            return False
+        workbook_part, rels_part = _workbook_parts(archive)
+        styles_part = next(
+            (_resolve_part(workbook_part, rel.get("Target")) for rel in etree.fromstring(archive.read(rels_part))
+             if rel.get("Type") == f"{REL_NS}/styles"),
+            None
+        )
+        if styles_part is None:
+            return False
+        root = etree.fromstring(archive.read(sheet_part))
+        styles_xml = archive.read(styles_part)
+    
+    sheet_data = root.find(f"{{{SHEET_MAIN_NS}}}sheetData")
+    if sheet_data is None:
+        return False
+    
+    # 結合セルを含む範囲はopenpyxlに任せる
+    for merged in root.iterfind(f"{{{SHEET_MAIN_NS}}}mergeCells/{{{SHEET_MAIN_NS}}}mergeCell"):
+        merged_min_col, merged_min_row, merged_max_col, merged_max_row = range_boundaries(merged.get("ref"))
+        if merged_min_col <= max_col and min_col <= merged_max_col and merged_min_row <= max_row and min_row <= merged_max_row:
+            return False
+    
+    rows = {}
+    for row in sheet_data.iterfind(f"{{{SHEET_MAIN_NS}}}row"):
+        if row.get("r") is None:
+            return False
+        rows[int(row.get("r"))] = row
+    
+    # 範囲内のセルを集める（存在しない行・セルは作成し、最後に行番号順・列順に並べ直す）
+    cells = []
+    rows_added = False
+    for row_number in range(min_row, max_row + 1):
+        row = rows.get(row_number)
+        if row is None:
+            row = rows[row_number] = etree.SubElement(sheet_data, f"{{{SHEET_MAIN_NS}}}row", r=str(row_number))
+            rows_added = True
+        existing = {}
+        for cell in row.iterfind(f"{{{SHEET_MAIN_NS}}}c"):
+            if cell.get("r") is None:
+                return False
+            existing[column_index_from_string(coordinate_from_string(cell.get("r"))[0])] = cell
+        cells_added = False
+        for column_number in range(min_col, max_col + 1):
+            cell = existing.get(column_number)
+            if cell is None:
+                cell = existing[column_number] = etree.SubElement(
+                    row, f"{{{SHEET_MAIN_NS}}}c", r=f"{get_column_letter(column_number)}{row_number}"
+                )
+                cells_added = True
+            cells.append(cell)
+        if cells_added:
+            row[:] = [existing[column_number] for column_number in sorted(existing)] + \
+                [child for child in row if child.tag != f"{{{SHEET_MAIN_NS}}}c"]
+            row.attrib.pop("spans", None)
+    if rows_added:
+        sheet_data[:] = [rows[row_number] for row_number in sorted(rows)]
+    
+    patched = _patch_styles_xml(styles_xml, sorted({int(cell.get("s", "0")) for cell in cells}), font, fill)
+    if patched is None:
+        return False
+    styles_xml, mapping = patched
+    for cell in cells:
+        cell.set("s", str(mapping[int(cell.get("s", "0"))]))
+    
+    # 使用範囲（dimension）を書式を設定したセルを含むように広げる
+    dimension = root.find(f"{{{SHEET_MAIN_NS}}}dimension")
+    if dimension is not None:
+        ref = dimension.get("ref", "A1")
+        old_min_col, old_min_row, old_max_col, old_max_row = range_boundaries(ref if ":" in ref else f"{ref}:{ref}")
+        dimension.set("ref", f"{get_column_letter(min(min_col, old_min_col))}{min(min_row, old_min_row)}:"
+                             f"{get_column_letter(max(max_col, old_max_col))}{max(max_row, old_max_row)}")
+    
+    _replace_zip_members(file_path, {
+        sheet_part: etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True),
+        styles_part: styles_xml,
+    })
+    _cache_invalidate(file_path)
+    return True
+
+def _write_sheet_xml(stream: Any, columns: List[str], rows: Any, row_count: int) -> None:
+    """
+    ヘッダー行とデータ行から、ワークシートXMLを1行ずつ逐次書き出す
+    
+    openpyxl の write_only モードと同様に、ルート要素で既定の名前空間を宣言して
+    名前空間なしの行要素を書き出す（行ごとに名前空間の宣言が重複しない）
+    
+    Args:
+        stream: 書き込み先（ZIP内のメンバーなど）
+        columns: ヘッダー行
+        rows: データ行のイテレータ
+        row_count: データ行の数（dimension要素に使用する）
+    """
+    with etree.xmlfile(stream, encoding="UTF-8") as xf:
+        xf.write_declaration(standalone=True)
+        with xf.element("worksheet", xmlns=SHEET_MAIN_NS):
+            if columns:
+                xf.write(etree.Element("dimension", ref=f"A1:{get_column_letter(len(columns))}{row_count + 1}"))
+            with xf.element("sheetData"):
+                letters = [get_column_letter(index) for index in range(1, len(columns) + 1)]
+                for row_number, row in enumerate([columns, *rows] if columns else [], start=1):
+                    row_element = etree.Element("row", r=str(row_number))
+                    for letter, value in zip(letters, row):
+                        if value is not None:
+                            _set_cell_element_value(
+                                etree.SubElement(row_element, "c", r=f"{letter}{row_number}"), value, namespace=""
+                            )
+                    xf.write(row_element)
+
+def _append_sheet_inplace(file_path: str, sheet_name: str, data: Optional[List[Dict[str, Any]]]) -> bool:
+    """
+    ワークブック全体を読み込まずに、新しいシートのXMLをZIPへ逐次書き出して追加する
+    
+    既存のシートや共有文字列は解析せずにそのままコピーし、ワークブックXML・リレーション・
+    [Content_Types].xml にシートの登録だけを追加する。追加するシートは1行ずつ書き出すため、
+    データの大きさに関わらずメモリ上にはシート全体を保持しない
+    
+    Args:
+        file_path: Excelファイルのパス
+        sheet_name: 新しいシート名
+        data: 追加するデータ（辞書のリスト）
+        
+    Returns:
+        追加した場合は True、この方法で追加できない場合は False（呼び出し側でopenpyxlを使用する）
+    """
+    if not LXML or not file_path.endswith(('.xlsx', '.xlsm')):
+        return False
+    if INVALID_TITLE_REGEX.search(sheet_name) or len(sheet_name) > 31:
+        return False
+    if data and not all(_can_patch_value(value) for record in data for value in record.values()):
+        return False
+    with _sessions_lock:
+        if os.path.abspath(file_path) in _sessions:
+            return False
+    
+    with ZipFile(file_path) as archive:
+        names = set(archive.namelist())
+        workbook_part, rels_part = _workbook_parts(archive)
+        workbook_xml = etree.fromstring(archive.read(workbook_part))
+        workbook_rels = etree.fromstring(archive.read(rels_part))
+        content_types = etree.fromstring(archive.read("[Content_Types].xml"))
+    
+    sheets = workbook_xml.find(f"{{{SHEET_MAIN_NS}}}sheets")
+    if sheets is None or any(sheet.get("name", "").lower() == sheet_name.lower() for sheet in sheets):
+        return False
+    
+    # 未使用のワークシートXMLのパス・シートID・リレーションIDを決める
+    sheet_dir = posixpath.join(posixpath.dirname(workbook_part), "worksheets")
+    sheet_part = next(
+        part for part in (posixpath.join(sheet_dir, f"sheet{index}.xml") for index in range(1, len(names) + 2))
+        if part not in names
+    )
+    sheet_id = max((int(sheet.get("sheetId", 0)) for sheet in sheets), default=0) + 1
+    rel_ids = {rel.get("Id") for rel in workbook_rels}
+    rel_id = next(f"rId{index}" for index in range(1, len(rel_ids) + 2) if f"rId{index}" not in rel_ids)
+    
+    # シートを登録する
+    etree.SubElement(sheets, f"{{{SHEET_MAIN_NS}}}sheet", {"name": sheet_name, "sheetId": str(sheet_id), f"{{{REL_NS}}}id": rel_id})
+    etree.SubElement(workbook_rels, f"{{{PKG_REL_NS}}}Relationship", {
+        "Id": rel_id,
+        "Type": f"{REL_NS}/worksheet",
+        "Target": posixpath.relpath(sheet_part, posixpath.dirname(workbook_part)),
+    })
+    etree.SubElement(content_types, f"{{{CONTYPES_NS}}}Override", {"PartName": f"/{sheet_part}", "ContentType": Worksheet.mime_type})
+    members = {
+        workbook_part: etree.tostring(workbook_xml, xml_declaration=True, encoding="UTF-8", standalone=True),
+        rels_part: etree.tostring(workbook_rels, xml_declaration=True, encoding="UTF-8", standalone=True),
+        "[Content_Types].xml": etree.tostring(content_types, xml_declaration=True, encoding="UTF-8", standalone=True),
+    }
+    
+    columns, rows = _records_to_rows(data) if data else ([], iter(()))
+    
+    def fill(target: ZipFile) -> None:
+        with ZipFile(file_path) as source:
+            for info in source.infolist():
+                target.writestr(info.filename, members.get(info.filename) or source.read(info))
+        with target.open(sheet_part, 'w') as stream:
+            _write_sheet_xml(stream, columns, rows, len(data) if data else 0)
+    
+    _write_zip(file_path, fill)
+    _cache_invalidate(file_path)
+    return True
+
+def _records_to_rows(data: List[Dict[str, Any]]) -> tuple:
+    """
+    辞書のリストをヘッダー行とデータ行に変換する（DataFrameを経由しない）
+    
+    列はすべての辞書のキーを最初に現れた順に並べ、キーがない項目は空セル（None）とする。
+    キーの並びが列と同じ辞書（通常はすべての行）は、キーごとに検索せず values() をそのまま使用する
+    
+    Args:
+        data: 辞書のリスト
+        
+    Returns:
+        (列名のリスト, 各行の値のリストを返すジェネレーター)
+    """
+    columns = list(dict.fromkeys(key for record in data for key in record))
+    rows = (
+        list(record.values()) if list(record) == columns else [record.get(key) for key in columns]
+        for record in data
+    )
+    return columns, rows
+
+def _frame_to_records(frame: pd.DataFrame, **extra_columns: Any) -> List[Dict[str, Any]]:
+    """
+    DataFrameを辞書のリストに変換する（to_dict('records') の高速版）
+    
+    行ごとに値を取り出すのではなく、列ごとに tolist() でPythonの値のリストへ一括変換してから
+    zip で行の辞書を組み立てる。NumPyの数値型もPythonの値になるため、JSON変換も速くなる
+    
+    Args:
+        frame: 変換するDataFrame
+        **extra_columns: 各行に追加する列（列名 → 行数と同じ長さのイテラブル）
+        
+    Returns:
+        行ごとの辞書のリスト
+    """
+    columns = frame.columns.tolist() + list(extra_columns)
+    values = [series.tolist() for _, series in frame.items()] + list(extra_columns.values())
+    return [dict(zip(columns, row)) for row in zip(*values)] if values else [{} for _ in range(len(frame))]
+
+def _describe_numeric(df: pd.DataFrame) -> dict:
+    """
+    数値列の統計情報を DataFrame.describe() と同じ形式で計算する
+    
+    describe() は列ごとにPythonで処理するため列数が多いと遅い。
+    ここでは整数・浮動小数点の列を1つのfloat64配列にまとめ、NumPyで列方向に一括計算する
+    （timedelta などの列は単位付きの値を返せるよう、従来どおり describe() で計算する）
+    
+    Args:
+        df: 数値列のみのDataFrame
+        
+    Returns:
+        列名 → {"count", "mean", "std", "min", "25%", "50%", "75%", "max"} の辞書
+    """
+    if len(df) == 0:
+        return df.describe().to_dict()
+    
+    fast = df.select_dtypes(include=[np.number], exclude=['timedelta'])
+    if len(fast.columns) < len(df.columns):
+        described = df[[column for column in df.columns if column not in fast.columns]].describe().to_dict()
+        computed = _describe_numeric(fast) if len(fast.columns) > 0 else {}
+        return {column: computed[column] if column in computed else described[column] for column in df.columns}
+    
+    values = df.to_numpy(dtype=np.float64, na_value=np.nan)
+    
+    # 全て欠損の列や値が1つの列では、describe() と同じく NaN とする
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        stats = {
+            "count": (~np.isnan(values)).sum(axis=0).astype(np.float64),
+            "mean": np.nanmean(values, axis=0),
+            "std": np.nanstd(values, axis=0, ddof=1),
+            "min": np.nanmin(values, axis=0),
+        }
+        q25, q50, q75 = np.nanquantile(values, [0.25, 0.5, 0.75], axis=0)
+        stats.update({"25%": q25, "50%": q50, "75%": q75, "max": np.nanmax(values, axis=0)})
+    
+    stats = {name: column.tolist() for name, column in stats.items()}
+    return {
+        column: {name: stats[name][i] for name in stats}
+        for i, column in enumerate(df.columns)
+    }
+
+def _sheet_names(file_path: str, st: os.stat_result) -> List[str]:
+    """
+    シート名の一覧を取得する（結果はキャッシュする）
+    
+    openpyxl は read_only モードでも開く際に共有文字列をすべて解析するため、
+    xlsxファイルはワークブックのXMLだけを読んでシート名を取り出す
+    
+    Args:
+        file_path: Excelファイルのパス
+        st: _stat_or_error で取得したファイルの状態
+        
+    Returns:
+        シート名のリスト
+    """
+    key = _cache_key(file_path, st, "sheetnames")
+    sheets = _cache_get(key)
+    if sheets is None:
+        if LXML and file_path.endswith(('.xlsx', '.xlsm')):
+            with ZipFile(file_path) as archive:
+                workbook_part, _ = _workbook_parts(archive)
+                workbook_xml = etree.fromstring(archive.read(workbook_part))
+            sheets = [
+                sheet.get("name")
+                for sheet in workbook_xml.iterfind(f"{{{SHEET_MAIN_NS}}}sheets/{{{SHEET_MAIN_NS}}}sheet")
+            ]
+        else:
+            # read_only モードではファイルを開いたままになるため、例外時も必ず閉じる
+            with contextlib.closing(openpyxl.load_workbook(file_path, read_only=True, keep_links=False)) as workbook:
+                sheets = workbook.sheetnames
+        _cache_put(key, sheets)
+    return sheets
+
+def _summarize_dataframe(df: pd.DataFrame, deep: bool = False) -> dict:
+    """
+    DataFrameのデータ概要（形状・型・欠損数・数値列の統計情報など）を作成する
+    
+    Args:
+        df: 対象のDataFrame
+        deep: Trueの場合、object列の中身まで走査して正確なメモリ使用量を計算する
+        
+    Returns:
+        データ概要を含む辞書
+    """
+    row_count, column_count = df.shape
+    summary = {
+        "shape": {"rows": row_count, "columns": column_count},
+        "columns": df.columns.tolist(),
+        "data_types": df.dtypes.astype(str).to_dict(),
+        "null_counts": df.isnull().sum().to_dict(),
+        "memory_usage": df.memory_usage(deep=deep).sum(),
+    }
+    
+    # 数値列の統計情報
+    numeric_columns = df.select_dtypes(include=['number']).columns
+    if len(numeric_columns) > 0:
+        summary["numeric_summary"] = _describe_numeric(df[numeric_columns])
+    
+    return summary
+
+def _read_dataframe(file_path: str, st: os.stat_result, sheet_name: Optional[str] = None) -> pd.DataFrame:
+    """
+    シートをDataFrameとして読み取る
+    
+    python-calamine がインストールされていればそちらで解析し、
+    なければ pandas 既定のエンジン（openpyxl の read_only / data_only モード）を使用する。
+    結果はキャッシュされ共有されるため、呼び出し側で変更しないこと
+    
+    Args:
+        file_path: Excelファイルのパス
+        st: _stat_or_error で取得したファイルの状態
+        sheet_name: 読み取るシート名（省略時は最初のシート）
+        
+    Returns:
+        読み取ったDataFrame
+    """
+    key = _cache_key(file_path, st, "dataframe", sheet_name)
+    df = _cache_get(key)
+    if df is None:
+        df = pd.read_excel(file_path, sheet_name=sheet_name or 0, engine=_READ_ENGINE)
+        _cache_put(key, df)
+    return df
+
+def _read_dataframes(file_path: str, st: os.stat_result, sheet_names: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    複数のシートをDataFrameとして読み取る
+    
+    キャッシュにないシートだけを1回の pd.read_excel でまとめて読み取り、シートごとにキャッシュする
+    （シートごとに読み取るとファイルを開く処理や共有文字列の解析が毎回発生するため）
+    
+    Args:
+        file_path: Excelファイルのパス
+        st: _stat_or_error で取得したファイルの状態
+        sheet_names: 読み取るシート名のリスト
+        
+    Returns:
+        シート名 → DataFrame の辞書
+    """
+    dfs = {sheet: _cache_get(_cache_key(file_path, st, "dataframe", sheet)) for sheet in sheet_names}
+    missing = [sheet for sheet, df in dfs.items() if df is None]
+    if missing:
+        for sheet, df in pd.read_excel(file_path, sheet_name=missing, engine=_READ_ENGINE).items():
+            _cache_put(_cache_key(file_path, st, "dataframe", sheet), df)
+            dfs[sheet] = df
+    return dfs
+
+def _find_matching_positions(series: pd.Series, pattern: str) -> np.ndarray:
+    """
+    検索文字列（正規表現、大文字小文字は区別しない）を含む行の位置を取得する
+    
+    pyarrow が利用可能な場合はArrowの文字列カーネルで列全体を一括検索し、
+    RE2で解釈できないパターンやpyarrowがない場合は pandas の str.contains を使用する
+    
+    Args:
+        series: 検索対象の列
+        pattern: 検索する値
+        
+    Returns:
+        一致した行の位置（0始まり）の配列
+    """
+    values = series.astype(str)
+    if pa is not None:
+        try:
+            mask = pc.match_substring_regex(pa.array(values), pattern, ignore_case=True)
+            return np.flatnonzero(pc.fill_null(mask, False).to_numpy(zero_copy_only=False))
+        except pa.ArrowInvalid:
+            pass
+    return np.flatnonzero(values.str.contains(pattern, na=False, case=False).to_numpy())
+
 @app.tool
-def read_excel_file(file_path: str, sheet_name: Optional[str] = None) -> dict:
+@_json_tool
+def read_excel_file(file_path: str, sheet_name: Optional[str] = None, limit: int = 1000, offset: int = 0) -> dict:
     """
-    Excelファイルを読み取る
+    Excelファイルを読み取る（大きなシートは limit / offset でページ単位に取得する）
     
     Args:
         file_path: Excelファイルのパス
         sheet_name: 読み取るシート名（省略時は最初のシート）
+        limit: 取得する最大行数
+        offset: 取得を開始するデータ行の位置（0から開始、ヘッダー行は含まない）
         
     Returns:
         読み取ったデータを含む辞書
     """
     try:
-        if not os.path.exists(file_path):
-            return {"error": f"ファイルが見つかりません: {file_path}"}
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
         
         # ファイル拡張子をチェック
         if not file_path.endswith(('.xlsx', '.xls')):
             return {"error": "サポートされていないファイル形式です。.xlsx または .xls ファイルを指定してください。"}
         
+        if limit < 0 or offset < 0:
+            return {"error": "limit と offset には0以上の値を指定してください"}
+        
         # Excelファイルを読み取る
-        if sheet_name:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-        else:
-            df = pd.read_excel(file_path)
+        df = _read_dataframe(file_path, st, sheet_name)
+        
+        # 指定された範囲の行だけを取り出す
+        page = df.iloc[offset:offset + limit]
         
-        # データを辞書形式に変換し、行番号にヘッダー分（+1）を追加
-        data_records = []
-        for idx, record in enumerate(df.to_dict('records')):
-            record['_excel_row_number'] = idx + 2  # ヘッダーを考慮して+2
-            data_records.append(record)
+        # データを辞書形式に変換し、Excelの行番号（ヘッダーを考慮して+2）を列として追加
+        data_records = _frame_to_records(page, _excel_row_number=range(offset + 2, offset + 2 + len(page)))
         
         # データを辞書形式に変換
+        row_count, column_count = df.shape
         data = {
             "file_path": file_path,
             "sheet_name": sheet_name or "デフォルトシート",
-            "shape": {"rows": len(df), "columns": len(df.columns)},
+            "shape": {"rows": row_count, "columns": column_count},
             "columns": df.columns.tolist(),
+            "offset": offset,
+            "limit": limit,
+            "returned_rows": len(data_records),
+            "has_more": offset + len(data_records) < row_count,
             "data": data_records,
-            "head": df.head().to_dict('records'),
-            "note": "データの行番号は _excel_row_number フィールドで確認できます（Excelの実際の行番号）"
+            "head": data_records[:5],
+            "note": "データの行番号は _excel_row_number フィールドで確認できます（Excelの実際の行番号）。続きの行は offset を指定して取得できます"
         }
         
         return data
@@ -68,6 +1142,7 @@ def read_excel_file(file_path: str, sheet_name: Optional[str] = None) -> dict:
         return {"error": f"エラーが発生しました: {str(e)}"}
 
 @app.tool
+@_json_tool
 def list_excel_sheets(file_path: str) -> dict:
     """
     Excelファイル内のシート一覧を取得する
@@ -79,12 +1154,11 @@ def list_excel_sheets(file_path: str) -> dict:
         シート名のリストを含む辞書
     """
     try:
-        if not os.path.exists(file_path):
-            return {"error": f"ファイルが見つかりません: {file_path}"}
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
         
-        # Excelファイルを開く
-        workbook = openpyxl.load_workbook(file_path)
-        sheets = workbook.sheetnames
+        sheets = _sheet_names(file_path, st)
         
         return {
             "file_path": file_path,
@@ -95,6 +1169,7 @@ def list_excel_sheets(file_path: str) -> dict:
         return {"error": f"エラーが発生しました: {str(e)}"}
 
 @app.tool
+@_json_tool
 def write_excel_file(file_path: str, data: List[Dict[str, Any]], sheet_name: str = "Sheet1") -> dict:
     """
     データをExcelファイルに書き込む
@@ -108,24 +1183,33 @@ def write_excel_file(file_path: str, data: List[Dict[str, Any]], sheet_name: str
         処理結果を含む辞書
     """
     try:
-        # データをDataFrameに変換
-        df = pd.DataFrame(data)
+        # 同じファイルのバックグラウンド保存が終わるまで待つ
+        _wait_for_pending_saves(file_path)
+        
+        # データをヘッダー行とデータ行に変換
+        columns, rows = _records_to_rows(data)
         
-        # Excelファイルに書き込む
-        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
+        # xlsxwriterで行を順にXMLへ書き出す（constant_memoryにより1行分のみ保持）
+        with xlsxwriter.Workbook(file_path, _XLSXWRITER_OPTIONS) as workbook:
+            worksheet = workbook.add_worksheet(sheet_name)
+            if columns:
+                worksheet.write_row(0, 0, columns)
+            for row_index, row in enumerate(rows, start=1):
+                worksheet.write_row(row_index, 0, row)
+        _cache_invalidate(file_path)
         
         return {
             "status": "success",
             "file_path": file_path,
             "sheet_name": sheet_name,
             "rows_written": len(data),
-            "columns": list(df.columns) if not df.empty else []
+            "columns": columns
         }
     except Exception as e:
         return {"error": f"エラーが発生しました: {str(e)}"}
 
 @app.tool
+@_json_tool
 def update_excel_cell(file_path: str, sheet_name: str, row: int, column: str, value: Any) -> dict:
     """
     Excelファイルの特定のセルを更新する
@@ -141,24 +1225,28 @@ def update_excel_cell(file_path: str, sheet_name: str, row: int, column: str, va
         処理結果を含む辞書
     """
     try:
-        if not os.path.exists(file_path):
-            return {"error": f"ファイルが見つかりません: {file_path}"}
-        
-        # Excelファイルを開く
-        workbook = openpyxl.load_workbook(file_path)
-        
-        # シートを取得
-        if sheet_name not in workbook.sheetnames:
-            return {"error": f"シート '{sheet_name}' が見つかりません"}
-        
-        worksheet = workbook[sheet_name]
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
         
-        # セルを更新
         cell_address = f"{column}{row}"
-        worksheet[cell_address] = value
         
-        # ファイルを保存
-        workbook.save(file_path)
+        # ワークシートXMLだけを書き換えて更新する（できない場合は下のopenpyxlでの更新を行う）
+        if not _patch_cells_inplace(file_path, {sheet_name: {cell_address: value}}):
+            # Excelファイルを開く
+            workbook = _checkout_workbook(file_path, st)
+            
+            # シートを取得
+            if sheet_name not in workbook.sheetnames:
+                return {"error": f"シート '{sheet_name}' が見つかりません"}
+            
+            worksheet = workbook[sheet_name]
+            
+            # セルを更新
+            worksheet[cell_address] = value
+            
+            # ファイルを保存
+            _save_workbook(file_path, workbook)
         
         return {
             "status": "success",
@@ -171,6 +1259,71 @@ def update_excel_cell(file_path: str, sheet_name: str, row: int, column: str, va
         return {"error": f"エラーが発生しました: {str(e)}"}
 
 @app.tool
+@_json_tool
+def update_excel_cells(file_path: str, updates: List[Dict[str, Any]]) -> dict:
+    """
+    Excelファイルの複数のセルをまとめて更新する（ファイルの読み込みと保存は1回だけ行う）
+    
+    Args:
+        file_path: Excelファイルのパス
+        updates: 更新内容のリスト（例: [{"sheet_name": "Sheet1", "cell": "A1", "value": "新しい値"}]）
+        
+    Returns:
+        処理結果を含む辞書
+    """
+    try:
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
+        
+        # 更新するセルがない場合はファイルを書き換えない
+        if not updates:
+            return {
+                "status": "success",
+                "file_path": file_path,
+                "cells_updated": 0
+            }
+        
+        # 途中まで更新された状態にならないよう、先にすべてのセル番地を確認する
+        # （編集セッション中はセッションのワークブックを直接変更するため、途中で失敗すると変更が残る）
+        for update in updates:
+            try:
+                column_letter, _ = coordinate_from_string(update["cell"])
+                column_index_from_string(column_letter)
+            except (CellCoordinatesException, ValueError):
+                return {"error": f"セル番地が正しくありません: {update['cell']}"}
+        
+        # シートごとにまとめ、ワークシートXMLだけを書き換えて更新する（できない場合はopenpyxlで更新する）
+        values_by_sheet = {}
+        for update in updates:
+            values_by_sheet.setdefault(update["sheet_name"], {})[update["cell"]] = update.get("value")
+        
+        if not _patch_cells_inplace(file_path, values_by_sheet):
+            # Excelファイルを開く
+            workbook = _checkout_workbook(file_path, st)
+            
+            # 途中まで更新された状態にならないよう、先にすべてのシートを確認する
+            for update in updates:
+                if update["sheet_name"] not in workbook.sheetnames:
+                    return {"error": f"シート '{update['sheet_name']}' が見つかりません"}
+            
+            # セルを更新
+            for update in updates:
+                workbook[update["sheet_name"]][update["cell"]] = update.get("value")
+            
+            # ファイルを保存
+            _save_workbook(file_path, workbook)
+        
+        return {
+            "status": "success",
+            "file_path": file_path,
+            "cells_updated": len(updates)
+        }
+    except Exception as e:
+        return {"error": f"エラーが発生しました: {str(e)}"}
+
+@app.tool
+@_json_tool
 def format_excel_cells(file_path: str, sheet_name: str, cell_range: str, 
                       font_color: Optional[str] = None, bg_color: Optional[str] = None,
                       bold: bool = False, font_size: Optional[int] = None) -> dict:
@@ -190,11 +1343,38 @@ def format_excel_cells(file_path: str, sheet_name: str, cell_range: str,
         処理結果を含む辞書
     """
     try:
-        if not os.path.exists(file_path):
-            return {"error": f"ファイルが見つかりません: {file_path}"}
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
+        
+        # フォントの設定
+        font_kwargs = {}
+        if font_color:
+            font_kwargs['color'] = font_color
+        if bold:
+            font_kwargs['bold'] = True
+        if font_size:
+            font_kwargs['size'] = font_size
+        
+        # スタイルオブジェクトは一度だけ作成し、全セルで共有する
+        font = Font(**font_kwargs) if font_kwargs else None
+        
+        # 背景色の設定
+        fill = PatternFill(start_color=bg_color, end_color=bg_color, fill_type="solid") if bg_color else None
+        
+        # 可能であればワークシートXMLとスタイルXMLだけを書き換える
+        # （シートが見つからない場合や編集セッション中は、下のopenpyxlでの処理で確認・適用する）
+        if _patch_range_style(file_path, sheet_name, cell_range, font, fill):
+            return {
+                "status": "success",
+                "file_path": file_path,
+                "sheet_name": sheet_name,
+                "cell_range": cell_range,
+                "formatting_applied": True
+            }
         
         # Excelファイルを開く
-        workbook = openpyxl.load_workbook(file_path)
+        workbook = _checkout_workbook(file_path, st)
         
         # シートを取得
         if sheet_name not in workbook.sheetnames:
@@ -205,24 +1385,13 @@ def format_excel_cells(file_path: str, sheet_name: str, cell_range: str,
         # フォーマットを適用
         for row in worksheet[cell_range]:
             for cell in row:
-                # フォントの設定
-                font_kwargs = {}
-                if font_color:
-                    font_kwargs['color'] = font_color
-                if bold:
-                    font_kwargs['bold'] = True
-                if font_size:
-                    font_kwargs['size'] = font_size
-                
-                if font_kwargs:
-                    cell.font = Font(**font_kwargs)
-                
-                # 背景色の設定
-                if bg_color:
-                    cell.fill = PatternFill(start_color=bg_color, end_color=bg_color, fill_type="solid")
+                if font is not None:
+                    cell.font = font
+                if fill is not None:
+                    cell.fill = fill
         
         # ファイルを保存
-        workbook.save(file_path)
+        _save_workbook(file_path, workbook)
         
         return {
             "status": "success",
@@ -235,6 +1404,7 @@ def format_excel_cells(file_path: str, sheet_name: str, cell_range: str,
         return {"error": f"エラーが発生しました: {str(e)}"}
 
 @app.tool
+@_json_tool
 def add_excel_sheet(file_path: str, sheet_name: str, data: Optional[List[Dict[str, Any]]] = None) -> dict:
     """
     Excelファイルに新しいシートを追加する
@@ -248,11 +1418,34 @@ def add_excel_sheet(file_path: str, sheet_name: str, data: Optional[List[Dict[st
         処理結果を含む辞書
     """
     try:
-        # ファイルが存在しない場合は新規作成
-        if not os.path.exists(file_path):
-            workbook = openpyxl.Workbook()
+        # ファイルが存在しない場合はwrite_onlyモードで新規作成（行を直接XMLへ書き出す）
+        st, error = _stat_or_error(file_path, missing_ok=True)
+        if error:
+            return error
+        if st is None:
+            # 保存はバックグラウンドで行われるため、保存先のフォルダはここで確認しておく
+            directory = os.path.dirname(os.path.abspath(file_path))
+            if not os.path.isdir(directory):
+                return {"error": f"保存先のフォルダが見つかりません: {directory}"}
+            if not os.access(directory, os.W_OK):
+                return {"error": f"保存先のフォルダに書き込めません: {directory}"}
+            workbook = openpyxl.Workbook(write_only=True)
         else:
-            workbook = openpyxl.load_workbook(file_path)
+            # 編集セッション中はセッションのワークブックで確認する（下のopenpyxlでの追加時）
+            with _sessions_lock:
+                in_session = os.path.abspath(file_path) in _sessions
+            if not in_session and sheet_name in _sheet_names(file_path, st):
+                return {"error": f"シート '{sheet_name}' は既に存在します"}
+            
+            # 既存のファイルには、可能であればシートのXMLだけを逐次書き出して追加する
+            if _append_sheet_inplace(file_path, sheet_name, data):
+                return {
+                    "status": "success",
+                    "file_path": file_path,
+                    "sheet_name": sheet_name,
+                    "rows_added": len(data) if data else 0
+                }
+            workbook = _checkout_workbook(file_path, st)
         
         # シートを追加
         if sheet_name in workbook.sheetnames:
@@ -262,12 +1455,13 @@ def add_excel_sheet(file_path: str, sheet_name: str, data: Optional[List[Dict[st
         
         # データが指定されている場合は書き込む
         if data:
-            df = pd.DataFrame(data)
-            for r in dataframe_to_rows(df, index=False, header=True):
-                worksheet.append(r)
+            columns, rows = _records_to_rows(data)
+            worksheet.append(columns)
+            for row in rows:
+                worksheet.append(row)
         
         # ファイルを保存
-        workbook.save(file_path)
+        _save_workbook(file_path, workbook)
         
         return {
             "status": "success",
@@ -279,6 +1473,7 @@ def add_excel_sheet(file_path: str, sheet_name: str, data: Optional[List[Dict[st
         return {"error": f"エラーが発生しました: {str(e)}"}
 
 @app.tool
+@_json_tool
 def delete_excel_sheet(file_path: str, sheet_name: str) -> dict:
     """
     Excelファイルからシートを削除する
@@ -291,11 +1486,12 @@ def delete_excel_sheet(file_path: str, sheet_name: str) -> dict:
         処理結果を含む辞書
     """
     try:
-        if not os.path.exists(file_path):
-            return {"error": f"ファイルが見つかりません: {file_path}"}
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
         
         # Excelファイルを開く
-        workbook = openpyxl.load_workbook(file_path)
+        workbook = _checkout_workbook(file_path, st)
         
         # シートを削除
         if sheet_name not in workbook.sheetnames:
@@ -307,7 +1503,7 @@ def delete_excel_sheet(file_path: str, sheet_name: str) -> dict:
         workbook.remove(workbook[sheet_name])
         
         # ファイルを保存
-        workbook.save(file_path)
+        _save_workbook(file_path, workbook)
         
         return {
             "status": "success",
@@ -319,48 +1515,68 @@ def delete_excel_sheet(file_path: str, sheet_name: str) -> dict:
         return {"error": f"エラーが発生しました: {str(e)}"}
 
 @app.tool
-def excel_data_summary(file_path: str, sheet_name: Optional[str] = None) -> dict:
+@_json_tool
+def excel_data_summary(file_path: str, sheet_name: Optional[str] = None, deep: bool = False) -> dict:
     """
     Excelファイルのデータ概要を取得する
     
     Args:
         file_path: Excelファイルのパス
         sheet_name: 分析するシート名（省略時は最初のシート）
+        deep: Trueの場合、文字列列を含む正確なメモリ使用量を計算する（大きなシートでは低速）
         
     Returns:
         データ概要を含む辞書
     """
     try:
-        if not os.path.exists(file_path):
-            return {"error": f"ファイルが見つかりません: {file_path}"}
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
         
         # Excelファイルを読み取る
-        if sheet_name:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-        else:
-            df = pd.read_excel(file_path)
+        df = _read_dataframe(file_path, st, sheet_name)
         
         # データ概要を生成
-        summary = {
+        return {
             "file_path": file_path,
             "sheet_name": sheet_name or "デフォルトシート",
-            "shape": {"rows": len(df), "columns": len(df.columns)},
-            "columns": df.columns.tolist(),
-            "data_types": df.dtypes.astype(str).to_dict(),
-            "null_counts": df.isnull().sum().to_dict(),
-            "memory_usage": df.memory_usage(deep=True).sum(),
+            **_summarize_dataframe(df, deep)
         }
+    except Exception as e:
+        return {"error": f"エラーが発生しました: {str(e)}"}
+
+@app.tool
+@_json_tool
+def excel_multi_sheet_summary(file_path: str, deep: bool = False) -> dict:
+    """
+    Excelファイル内のすべてのシートのデータ概要をまとめて取得する
+    
+    Args:
+        file_path: Excelファイルのパス
+        deep: Trueの場合、文字列列を含む正確なメモリ使用量を計算する（大きなシートでは低速）
+        
+    Returns:
+        シート名ごとのデータ概要を含む辞書
+    """
+    try:
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
         
-        # 数値列の統計情報
-        numeric_columns = df.select_dtypes(include=['number']).columns
-        if len(numeric_columns) > 0:
-            summary["numeric_summary"] = df[numeric_columns].describe().to_dict()
+        # すべてのシートを読み取る（ファイルを開くのは1回だけ）
+        sheets = _sheet_names(file_path, st)
+        dfs = _read_dataframes(file_path, st, sheets)
         
-        return summary
+        return {
+            "file_path": file_path,
+            "total_sheets": len(sheets),
+            "sheets": {sheet: _summarize_dataframe(dfs[sheet], deep) for sheet in sheets}
+        }
     except Exception as e:
         return {"error": f"エラーが発生しました: {str(e)}"}
 
 @app.tool
+@_json_tool
 def find_excel_row_by_content(file_path: str, sheet_name: str, search_column: str, search_value: str) -> dict:
     """
     指定した列の値で行を検索し、Excelの実際の行番号を取得する
@@ -375,14 +1591,15 @@ def find_excel_row_by_content(file_path: str, sheet_name: str, search_column: st
         検索結果を含む辞書
     """
     try:
-        if not os.path.exists(file_path):
-            return {"error": f"ファイルが見つかりません: {file_path}"}
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
         
         # Excelファイルを読み取る
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        df = _read_dataframe(file_path, st, sheet_name)
         
         # 指定した値を検索
-        matches = df[df[search_column].astype(str).str.contains(search_value, na=False, case=False)]
+        matches = df.iloc[_find_matching_positions(df[search_column], search_value)]
         
         if matches.empty:
             return {
@@ -390,15 +1607,18 @@ def find_excel_row_by_content(file_path: str, sheet_name: str, search_column: st
                 "message": f"'{search_value}' が列 '{search_column}' で見つかりませんでした"
             }
         
-        # マッチした行の情報を返す
-        results = []
-        for idx, row in matches.iterrows():
-            excel_row_number = idx + 2  # ヘッダーを考慮して+2
-            results.append({
+        # マッチした行の情報を返す（行ごとのSeriesは作らずにまとめて変換する）
+        pandas_indexes = matches.index.tolist()
+        excel_row_numbers = (matches.index.to_numpy() + 2).tolist()  # ヘッダーを考慮して+2
+        results = [
+            {
                 "excel_row_number": excel_row_number,
-                "pandas_index": idx,
-                "data": row.to_dict()
-            })
+                "pandas_index": pandas_index,
+                "data": record
+            }
+            for excel_row_number, pandas_index, record in zip(
+                excel_row_numbers, pandas_indexes, _frame_to_records(matches))
+        ]
         
         return {
             "found": True,
@@ -410,6 +1630,105 @@ def find_excel_row_by_content(file_path: str, sheet_name: str, search_column: st
     except Exception as e:
         return {"error": f"エラーが発生しました: {str(e)}"}
 
+@app.tool
+@_json_tool
+def open_workbook_session(file_path: str) -> dict:
+    """
+    ワークブックの編集セッションを開始する
+    
+    セッション中は update_excel_cell などの編集ツールがファイルを保存せずに
+    メモリ上のワークブックを変更し、commit_workbook_session でまとめて保存する
+    
+    Args:
+        file_path: Excelファイルのパス
+        
+    Returns:
+        処理結果を含む辞書
+    """
+    try:
+        st, error = _stat_or_error(file_path)
+        if error:
+            return error
+        
+        path = os.path.abspath(file_path)
+        with _sessions_lock:
+            if path in _sessions:
+                return {"error": f"セッションは既に開始されています: {file_path}"}
+        
+        # Excelファイルを開き、セッションとして保持する
+        workbook = _checkout_workbook(file_path, st)
+        with _sessions_lock:
+            if _sessions.setdefault(path, workbook) is not workbook:
+                return {"error": f"セッションは既に開始されています: {file_path}"}
+        
+        return {
+            "status": "success",
+            "file_path": file_path,
+            "sheets": workbook.sheetnames,
+            "note": "編集内容は commit_workbook_session を呼び出すまでファイルに保存されません（読み取り系のツールは保存済みの内容を返します）"
+        }
+    except Exception as e:
+        return {"error": f"エラーが発生しました: {str(e)}"}
+
+@app.tool
+@_json_tool
+def commit_workbook_session(file_path: str) -> dict:
+    """
+    編集セッションの変更をファイルに保存し、セッションを終了する
+    
+    Args:
+        file_path: Excelファイルのパス
+        
+    Returns:
+        処理結果を含む辞書
+    """
+    try:
+        path = os.path.abspath(file_path)
+        with _sessions_lock:
+            workbook = _sessions.get(path)
+        if workbook is None:
+            return {"error": f"セッションが開始されていません: {file_path}"}
+        
+        # ファイルを保存（保存に失敗した場合はセッションを残す）
+        _write_workbook(file_path, workbook)
+        _checkin_workbook(file_path, workbook)
+        with _sessions_lock:
+            _sessions.pop(path, None)
+        
+        return {
+            "status": "success",
+            "file_path": file_path,
+            "sheets": workbook.sheetnames
+        }
+    except Exception as e:
+        return {"error": f"エラーが発生しました: {str(e)}"}
+
+@app.tool
+@_json_tool
+def flush_workbook(file_path: str) -> dict:
+    """
+    バックグラウンドで行われている保存の完了を待ち、ファイルへの書き込みを確定する
+    
+    編集ツールは保存を予約してすぐに応答するため、保存に失敗した場合はこのツールでエラーが報告される
+    
+    Args:
+        file_path: Excelファイルのパス
+        
+    Returns:
+        処理結果を含む辞書
+    """
+    try:
+        save_error = _wait_for_pending_saves(file_path)
+        if save_error is not None:
+            return {"error": f"ファイルの保存に失敗しました: {save_error}"}
+        
+        return {
+            "status": "success",
+            "file_path": file_path
+        }
+    except Exception as e:
+        return {"error": f"エラーが発生しました: {str(e)}"}
+
 def main():
     app.run()
 